@@ -0,0 +1,75 @@
+"""AST analysis for Code Map Viewer: functions, classes and call edges."""
+import ast
+from operator import attrgetter
+from typing import Any, Callable, Optional, Union
+
+# (function_names, class_func_map, func_to_class, function_line_no, calls, super_calls)
+Analysis = tuple[
+    list[str],
+    dict[str, list[str]],
+    dict[str, str],
+    dict[str, int],
+    list[tuple[str, str]],
+    list[tuple[str, str]],
+]
+
+# Callee name for each supported call target type: foo(...) and obj.foo(...)
+CALLEE_EXTRACTORS: dict[type, Callable[[Any], str]] = {
+    ast.Name: attrgetter("id"),
+    ast.Attribute: attrgetter("attr"),
+}
+
+
+def analyze(tree: ast.AST) -> Analysis:
+    # One flat ast.walk with isinstance checks instead of NodeVisitor's
+    # per-node method dispatch. ast.walk yields a parent before its children,
+    # so each node's enclosing (class, function) scope is handed down to its
+    # children as the walk reaches them.
+    function_names: dict[str, None] = {}  # insertion-ordered set of qualified names
+    function_line_no: dict[str, int] = {}
+    class_func_map: dict[str, list[str]] = {}
+    func_to_class: dict[str, str] = {}
+    calls: list[tuple[str, str]] = []
+    super_calls: list[tuple[str, str]] = []
+
+    defs: list[tuple[Union[ast.ClassDef, ast.FunctionDef], Optional[str], Optional[str]]] = []
+    scopes: dict[ast.AST, tuple[Optional[str], Optional[str]]] = {tree: (None, None)}
+    for node in ast.walk(tree):
+        enclosing_class, current_function = scope = scopes[node]
+
+        if isinstance(node, ast.Call):
+            if current_function is not None:
+                func = node.func
+                extract_callee = CALLEE_EXTRACTORS.get(type(func))
+                if extract_callee is not None:
+                    callee = extract_callee(func)
+                    calls.append((current_function, callee))
+                    # super().callee(...) or super(Cls, self).callee(...)
+                    value = getattr(func, "value", None)
+                    if type(value) is ast.Call and getattr(value.func, "id", None) == "super":
+                        super_calls.append((current_function, callee))
+        elif isinstance(node, ast.ClassDef):
+            defs.append((node, enclosing_class, None))
+            scope = (node.name, current_function)
+        elif isinstance(node, ast.FunctionDef):
+            full_name = f"{enclosing_class}.{node.name}" if enclosing_class else node.name
+            defs.append((node, enclosing_class, full_name))
+            scope = (enclosing_class, full_name)
+
+        for child in ast.iter_child_nodes(node):
+            scopes[child] = scope
+
+    # ast.walk is breadth-first; register definitions in source order so
+    # nodes (and first-match callee resolution) follow the file
+    defs.sort(key=lambda d: (d[0].lineno, d[0].col_offset))
+    for def_node, parent_class, qualified_name in defs:
+        if qualified_name is None:
+            class_func_map[def_node.name] = []
+            continue
+        if parent_class:
+            class_func_map[parent_class].append(qualified_name)
+            func_to_class[qualified_name] = parent_class
+        function_names.setdefault(qualified_name, None)
+        function_line_no.setdefault(qualified_name, def_node.lineno)
+
+    return list(function_names), class_func_map, func_to_class, function_line_no, calls, super_calls
@@ -1,108 +1,29 @@
 import ast
 from pyvis.network import Network
-from collections import defaultdict
+from analyzer import analyze
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import hashlib
 import json
+import orjson
+import os
+import pickle
 import sys
 
-# === Get Python file path from command line ===
-if len(sys.argv) < 2:
-    print("Usage: python main.py <python_file.py>")
-    sys.exit(1)
-file_path = sys.argv[1]
-
-# === AST Analysis Code ===
-code = Path(file_path).read_text(encoding="utf-8")
-tree = ast.parse(code)
-
-function_names = []
-function_line_no = {}
-calls = []
-
-class_names = []
-class_line_no = {}
-class_func_map = {}
-
-class Analyzer(ast.NodeVisitor):
-    def __init__(self):
-        self.class_stack = []
-        self.function_names = []
-        self.class_func_map = {}
-        self.calls = []
-        self.super_calls = []
-        self.function_line_no = {}
-
-    def visit_ClassDef(self, node):
-        class_name = node.name
-        self.class_stack.append(class_name)
-        self.class_func_map[class_name] = []
-        self.generic_visit(node)
-        self.class_stack.pop()
-
-    def visit_FunctionDef(self, node):
-        if self.class_stack:
-            full_name = f"{self.class_stack[-1]}.{node.name}"
-            self.class_func_map[self.class_stack[-1]].append(full_name)
-        else:
-            full_name = node.name
-
-        if full_name not in self.function_names:
-            self.function_names.append(full_name)
-            self.function_line_no[full_name] = node.lineno
-
-        self.current_function = full_name
-        self.generic_visit(node)
-        self.current_function = None
-
-    def visit_Call(self, node):
-        if not hasattr(self, "current_function") or self.current_function is None:
-            return
-
-        if isinstance(node.func, ast.Name):
-            callee = node.func.id
-        elif isinstance(node.func, ast.Attribute):
-            if (
-                isinstance(node.func.value, ast.Call)
-                and isinstance(node.func.value.func, ast.Name)
-                and node.func.value.func.id == "super"
-            ):
-                callee = node.func.attr
-                self.calls.append((self.current_function, callee))
-                self.super_calls.append((self.current_function, callee))
-                return
-            else:
-                callee = node.func.attr
-        else:
-            return
-
-        self.calls.append((self.current_function, callee))
-        self.generic_visit(node)
-# Run the visitors
-analyzer = Analyzer()
-analyzer.visit(tree)
-
-function_names = analyzer.function_names
-class_func_map = analyzer.class_func_map
-function_line_no = analyzer.function_line_no
-calls = analyzer.calls
-super_calls = analyzer.super_calls
-
-
-# Filter out self-calls and calls to non-existing functions
-filtered_calls = []
-for caller, callee in calls:
-    if caller == callee:
-        continue
-    for fn in function_names:
-        if fn.endswith(f".{callee}") or fn == callee:
-            filtered_calls.append((caller, fn))
-            break
-
-
-# === Build the graph with Pyvis ===
-net = Network(height="600px", width="900px", directed=True, bgcolor="#ffffff")
+# === Analysis cache ===
+# Results are keyed on the resolved path, mtime and size of the input, so
+# re-running on an unchanged file (e.g. from a watch loop) skips parsing
+# and the AST walk entirely. Bump CACHE_VERSION when analyze()'s output changes.
+CACHE_DIR = Path.home() / ".cache" / "code_map_viewer"
+CACHE_VERSION = 2
 
+# === Graph styles and layout ===
 # --- Color styles ---
+# Nested dicts are shared by reference across every node of a kind; they are
+# never mutated after this point, only serialized.
+NODE_HIGHLIGHT_COLOR = {"background": "#fff8c6", "border": "#e60000"}
+
 CLASS_NODE_STYLE = dict(
     shape="box",
     widthConstraint={"minimum": 120},
@@ -111,7 +32,7 @@ CLASS_NODE_STYLE = dict(
     color={
         "background": "#1e3a5c",
         "border": "#0a1a2f",
-        "highlight": {"background": "#fff8c6", "border": "#e60000"}
+        "highlight": NODE_HIGHLIGHT_COLOR
     },
     font={"face": "arial", "size": 20, "color": "#fff", "align": "center"}
 )
@@ -123,7 +44,7 @@ FUNC_NODE_STYLE = dict(
     color={
         "background": "#d0eaff",
         "border": "#333333",
-        "highlight": {"background": "#fff8c6", "border": "#e60000"}
+        "highlight": NODE_HIGHLIGHT_COLOR
     },
     font={"face": "arial", "size": 18, "align": "center"}
 )
@@ -134,72 +55,23 @@ GLOBAL_NODE_STYLE = dict(
     color={
         "background": "#6e44ff",
         "border": "#2d186c",
-        "highlight": {"background": "#fff8c6", "border": "#e60000"}
+        "highlight": NODE_HIGHLIGHT_COLOR
     },
     font={"face": "arial", "size": 20, "color": "#fff", "align": "center"}
 )
 
-# Add nodes for classes
-for cls in class_func_map.keys():
-    net.add_node(
-        n_id=f"class::{cls}",
-        label=cls,
-        title=f"Class: {cls}",
-        **CLASS_NODE_STYLE
-    )
-
-# Add a node for global functions (not inside a class)
-if any(fn not in [f for fs in class_func_map.values() for f in fs] for fn in function_names):
-    net.add_node(
-        n_id="global::Global",
-        label="Global",
-        title="Global Functions",
-        **GLOBAL_NODE_STYLE
-    )
-
-# Add nodes for functions, with edges from class/global
-for fn in function_names:
-    parent_cls = None
-    for cls, funcs in class_func_map.items():
-        if fn in funcs:
-            parent_cls = cls
-            break
-    title = f"{fn} (Class: {parent_cls})" if parent_cls else f"{fn} (Global)"
-    net.add_node(n_id=fn, label=fn, title=title, **FUNC_NODE_STYLE)
-    if parent_cls:
-        net.add_edge(f"class::{parent_cls}", fn, color="#1e3a5c", arrows="to", width=2)
-    else:
-        net.add_edge("global::Global", fn, color="#6e44ff", arrows="to", width=2)
-
-# Edges for function calls
-for caller, callee in filtered_calls:
-    if (caller, callee.split(".")[-1]) in super_calls:
-        net.add_edge(caller, callee, color="#0077ff", arrows="to", width=2, dashes=True)
-    else:
-        net.add_edge(caller, callee, color="gray", arrows="to", width=1)
-
-
-# Layout options (hierarchical)
-net.set_options("""
-{
-  "layout": {
-    "hierarchical": {
-      "direction": "UD",
-      "sortMethod": "directed",
-      "levelSeparation": 120,
-      "nodeSpacing": 180
-    }
-  },
-  "physics": {"enabled": false},
-  "interaction": {"hover": true, "selectConnectedEdges": false},
-  "autoResize": true
-}
-""")
+# --- Precomputed layout for large graphs ---
+# vis.js solves the hierarchical layout in the browser on a single thread,
+# which gets slow past a few hundred nodes. Above the threshold main() assigns
+# fixed x/y coordinates instead and turns the hierarchy off.
+LARGE_GRAPH_THRESHOLD = 500
+LEVEL_SEPARATION = 120
+NODE_SPACING = 180
 
-# Create initial HTML file
-HTML_PATH = "function_graph.html"
-net.write_html(HTML_PATH)
-html = Path(HTML_PATH).read_text(encoding="utf-8")
+# Hover titles only repeat the label plus the owning class (already shown by
+# the membership edge); past this many functions they are left out to keep
+# the embedded JSON small
+FUNC_TITLE_LIMIT = 5000
 
 # === CSS and Legend ===
 CSS_CODE = '''
@@ -333,23 +205,314 @@ LEGEND_HTML = '''
 </div>
 '''
 
-# Inject CSS into <head>
-html = html.replace('</head>', CSS_CODE + '</head>', 1)
+# === Output ===
+HTML_PATH = "function_graph.html"
+JSON_CHUNK_SIZE = 10_000
 
-# Wrap the graph and inject the legend before <div id="mynetwork">
-html = html.replace(
-    '<div id="mynetwork"',
-    LEGEND_HTML + '\n<div id="main-graph-container">\n  <div id="graph-div">\n    <div id="mynetwork"',
-    1
-)
+# === AST Analysis ===
+def analyze_file(file_path):
+    source_path = Path(file_path).resolve()
+    source_stat = source_path.stat()
+    cache_key = f"{CACHE_VERSION}:{source_path}:{source_stat.st_mtime_ns}:{source_stat.st_size}"
+    cache_file = CACHE_DIR / f"{hashlib.sha256(cache_key.encode('utf-8')).hexdigest()}.pkl"
+
+    try:
+        return pickle.loads(cache_file.read_bytes())
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    # Hand the raw bytes straight to the compiler: no separate decode pass,
+    # and PEP 263 encoding declarations are honoured
+    code = source_path.read_bytes()
+    tree = compile(code, str(source_path), "exec", flags=ast.PyCF_ONLY_AST, dont_inherit=True)
+
+    analysis = analyze(tree)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_file.write_bytes(pickle.dumps(analysis, protocol=pickle.HIGHEST_PROTOCOL))
+    except OSError:
+        pass  # caching is best-effort
+    return analysis
+
+def module_prefixes(file_paths):
+    # Dotted module path of each file relative to the inputs' common parent
+    # directory, e.g. a/utils.py and b/utils.py -> "a.utils." and "b.utils."
+    # (a package's __init__.py maps to the package name)
+    source_paths = [Path(file_path).resolve() for file_path in file_paths]
+    root = Path(os.path.commonpath([path.parent for path in source_paths]))
+    prefixes = []
+    for path in source_paths:
+        parts = path.relative_to(root).with_suffix("").parts
+        if len(parts) > 1 and parts[-1] == "__init__":
+            parts = parts[:-1]
+        prefixes.append(".".join(parts) + ".")
+    return prefixes
+
+def merge_analyses(prefixes, analyses):
+    # Prefix every class and function with its module path ("pkg.module.Class.method")
+    # so same-named definitions in different files stay separate nodes. Callees
+    # stay bare names and are resolved in main(), preferring the caller's own
+    # module; function_module maps each qualified function to its prefix for that.
+    function_names = {}
+    function_module = {}
+    class_func_map = {}
+    func_to_class = {}
+    function_line_no = {}
+    calls = []
+    super_calls = []
+    for prefix, analysis in zip(prefixes, analyses):
+        names, module_classes, module_func_to_class, line_no, module_calls, module_super_calls = analysis
+        function_names.update(dict.fromkeys(prefix + fn for fn in names))
+        function_module.update((prefix + fn, prefix) for fn in names)
+        for cls, funcs in module_classes.items():
+            class_func_map[prefix + cls] = [prefix + fn for fn in funcs]
+        func_to_class.update((prefix + fn, prefix + cls) for fn, cls in module_func_to_class.items())
+        function_line_no.update((prefix + fn, line) for fn, line in line_no.items())
+        calls.extend((prefix + caller, callee) for caller, callee in module_calls)
+        super_calls.extend((prefix + caller, callee) for caller, callee in module_super_calls)
+    analysis = list(function_names), class_func_map, func_to_class, function_line_no, calls, super_calls
+    return analysis, function_module
+
+# === HTML writing ===
+def write_json_array(fh, records):
+    # Encode in slices so only one chunk's bytes are alive at a time, rather
+    # than the whole array (and a str copy of the whole page) in memory.
+    # The JSON lands inside a <script> block and ids/labels can carry file
+    # names, so escape like Jinja's tojson: these characters only occur inside
+    # JSON strings, where the \uXXXX forms decode to the same text.
+    fh.write(b"[")
+    for start in range(0, len(records), JSON_CHUNK_SIZE):
+        if start:
+            fh.write(b",")
+        chunk = orjson.dumps(records[start:start + JSON_CHUNK_SIZE])[1:-1]
+        chunk = (
+            chunk.replace(b"<", b"\\u003c")
+            .replace(b">", b"\\u003e")
+            .replace(b"&", b"\\u0026")
+            .replace(b"'", b"\\u0027")
+        )
+        fh.write(chunk)
+    fh.write(b"]")
+
+def write_text(fh, *parts):
+    for part in parts:
+        fh.write(part.encode("utf-8"))
+
+def main():
+    # --- Python file paths from command line ---
+    if len(sys.argv) < 2:
+        print("Usage: python main.py <python_file.py> [more_files.py ...]")
+        sys.exit(1)
+    file_paths = sys.argv[1:]
+
+    # --- AST analysis ---
+    if len(file_paths) == 1:
+        analysis = analyze_file(file_paths[0])
+        function_module = {}
+    else:
+        prefixes = module_prefixes(file_paths)
+        duplicates = sorted(prefix[:-1] for prefix, count in Counter(prefixes).items() if count > 1)
+        if duplicates:
+            print(f"Error: several input files map to the same module name: {', '.join(duplicates)}")
+            sys.exit(1)
+
+        # Parsing and walking each file is CPU-bound and independent, so spread
+        # it over processes
+        with ProcessPoolExecutor(max_workers=min(len(file_paths), os.cpu_count() or 1)) as pool:
+            analyses = list(pool.map(analyze_file, file_paths))
+        analysis, function_module = merge_analyses(prefixes, analyses)
+
+    function_names, class_func_map, func_to_class, function_line_no, calls, super_calls = analysis
+
+    # Index function names for O(1) callee resolution (exact name, then bare name)
+    function_names_set = set(function_names)
+    suffix_index = defaultdict(list)
+    for fn in function_names:
+        suffix_index[fn.rsplit(".", 1)[-1]].append(fn)
+
+    # Filter out self-calls and calls to non-existing functions; repeated
+    # (caller, callee) pairs collapse into a single edge with a call count.
+    # A callee resolves to an exact name in the caller's module first, then to
+    # the first same-named function in that module, then to the first one
+    # defined anywhere (single-file runs have one module, with prefix "").
+    filtered_calls = Counter()
+    for caller, callee in calls:
+        module = function_module.get(caller, "")
+        fn = module + callee
+        if fn not in function_names_set:
+            candidates = suffix_index.get(callee, ())
+            fn = next((c for c in candidates if function_module.get(c, "") == module), None)
+            if fn is None and candidates:
+                fn = candidates[0]
+        if fn is not None and fn != caller:
+            filtered_calls[(caller, fn)] += 1
+
+    # --- Build the graph with Pyvis ---
+    net = Network(height="600px", width="900px", directed=True, bgcolor="#ffffff", cdn_resources="remote")
+
+    has_global = any(fn not in func_to_class for fn in function_names)
+    root_ids = [f"class::{cls}" for cls in class_func_map] + (["global::Global"] if has_global else [])
+    node_positions = {}
+
+    if len(root_ids) + len(function_names) > LARGE_GRAPH_THRESHOLD:
+        # Class/Global nodes sit on level 0; functions start on level 1 and
+        # callees are pushed one level below their first (BFS) caller
+        callees_of = defaultdict(list)
+        called = set()
+        for caller, callee in filtered_calls:
+            callees_of[caller].append(callee)
+            called.add(callee)
+
+        # Seed with uncalled functions first, then with anything left over
+        # (functions only reachable through call cycles)
+        level = {}
+        seeds = [fn for fn in function_names if fn not in called] + function_names
+        for seed in seeds:
+            if seed in level:
+                continue
+            level[seed] = 1
+            queue = deque([seed])
+            while queue:
+                fn = queue.popleft()
+                for callee in callees_of[fn]:
+                    if callee not in level:
+                        level[callee] = level[fn] + 1
+                        queue.append(callee)
+
+        levels = defaultdict(list)
+        levels[0] = root_ids
+        for fn in function_names:
+            levels[level[fn]].append(fn)
+        for depth, ids in levels.items():
+            offset = (len(ids) - 1) * NODE_SPACING / 2
+            for i, n_id in enumerate(ids):
+                node_positions[n_id] = dict(
+                    x=i * NODE_SPACING - offset,
+                    y=depth * LEVEL_SEPARATION,
+                    physics=False,
+                    fixed=True,
+                )
+
+    # Add nodes for classes
+    for cls in class_func_map.keys():
+        net.add_node(
+            n_id=f"class::{cls}",
+            label=cls,
+            title=f"Class: {cls}",
+            **CLASS_NODE_STYLE,
+            **node_positions.get(f"class::{cls}", {})
+        )
+
+    # Add a node for global functions (not inside a class)
+    if has_global:
+        net.add_node(
+            n_id="global::Global",
+            label="Global",
+            title="Global Functions",
+            **GLOBAL_NODE_STYLE,
+            **node_positions.get("global::Global", {})
+        )
+
+    # Add nodes for functions. Pyvis's add_node scans its node_ids list on every
+    # call and rebuilds the record from kwargs, so the records are built here and
+    # appended in one batch (keeping Pyvis's node_ids/node_map in sync)
+    def function_title(fn):
+        parent_cls = func_to_class.get(fn)
+        return f"{fn} (Class: {parent_cls})" if parent_cls else f"{fn} (Global)"
+
+    with_titles = len(function_names) <= FUNC_TITLE_LIMIT
+
+    func_nodes = []
+    for fn in function_names:
+        # FUNC_NODE_STYLE is the prototype: a shallow copy shares its nested dicts
+        node = FUNC_NODE_STYLE.copy()
+        node["id"] = fn
+        node["label"] = fn
+        if with_titles:
+            node["title"] = function_title(fn)
+        if node_positions:
+            node.update(node_positions[fn])
+        func_nodes.append(node)
+    net.nodes.extend(func_nodes)
+    net.node_ids.extend(function_names)
+    net.node_map.update(zip(function_names, func_nodes))
+
+    # Edges are appended as plain records too: every endpoint is a node added
+    # above (callees were resolved against function_names), so add_edge's
+    # per-call scan of node_ids would only repeat that check
+    super_call_set = set(super_calls)
+    edge_records = []
+
+    # Edges from class/global to their functions
+    for fn in function_names:
+        parent_cls = func_to_class.get(fn)
+        if parent_cls:
+            edge_records.append({"from": f"class::{parent_cls}", "to": fn, "color": "#1e3a5c", "arrows": "to", "width": 2})
+        else:
+            edge_records.append({"from": "global::Global", "to": fn, "color": "#6e44ff", "arrows": "to", "width": 2})
+
+    # Edges for function calls
+    for (caller, callee), count in filtered_calls.items():
+        title = f"{count} calls" if count > 1 else "1 call"
+        if (caller, callee.rsplit(".", 1)[-1]) in super_call_set:
+            edge_records.append({"from": caller, "to": callee, "color": "#0077ff", "arrows": "to", "width": 2, "dashes": True, "title": title})
+        else:
+            edge_records.append({"from": caller, "to": callee, "color": "gray", "arrows": "to", "width": 1, "title": title})
+
+    net.edges.extend(edge_records)
+
+    # Layout options (hierarchical, unless positions were precomputed above)
+    if node_positions:
+        layout_options = {"hierarchical": {"enabled": False}}
+    else:
+        layout_options = {
+            "hierarchical": {
+                "direction": "UD",
+                "sortMethod": "directed",
+                "levelSeparation": LEVEL_SEPARATION,
+                "nodeSpacing": NODE_SPACING
+            }
+        }
+    net.set_options(json.dumps({
+        "layout": layout_options,
+        "physics": {"enabled": False},
+        "interaction": {"hover": True, "selectConnectedEdges": False},
+        "autoResize": True
+    }))
+
+    # --- Stream the page to disk ---
+    # Pyvis embeds nodes/edges through Jinja's tojson (stdlib json with sorted
+    # keys), which dominates rendering time on large graphs. Render the page
+    # around empty data sets and write orjson output in their place instead
+    # (escaped the same way, see write_json_array).
+    graph_nodes, graph_edges = net.nodes, net.edges
+    net.nodes, net.edges = [], []
+    network_html = net.generate_html()
+    net.nodes, net.edges = graph_nodes, graph_edges
+
+    # Split the Pyvis page at the injection points: the end of <head>, the graph
+    # container, the two data sets, and the end of the graph script
+    head, _, body = network_html.partition('</head>')
+    body_start, _, network = body.partition('<div id="mynetwork"')
+    before_nodes, _, network = network.partition('nodes = new vis.DataSet([])')
+    before_edges, _, network = network.partition('edges = new vis.DataSet([])')
+    script_end = network.index('</script>') + len('</script>')
+
+    with open(HTML_PATH, "wb", buffering=1 << 20) as fh:
+        write_text(
+            fh,
+            head, CSS_CODE, '</head>',
+            body_start,
+            LEGEND_HTML, '\n<div id="main-graph-container">\n  <div id="graph-div">\n    <div id="mynetwork"',
+            before_nodes, 'nodes = new vis.DataSet(',
+        )
+        write_json_array(fh, net.nodes)
+        write_text(fh, ')', before_edges, 'edges = new vis.DataSet(')
+        write_json_array(fh, net.edges)
+        write_text(fh, ')', network[:script_end], '\n  </div>\n</div>', network[script_end:])
+
+    print("HTML saved – open function_graph.html now")
 
-# Close containers after the Pyvis script
-html = html.replace(
-    '</script>',
-    '</script>\n  </div>\n</div>',
-    1
-)
 
-# Final save
-Path(HTML_PATH).write_text(html, encoding="utf-8")
-print("HTML updated and saved – open function_graph.html now")
+if __name__ == "__main__":
+    main()